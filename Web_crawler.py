@@ -1,9 +1,14 @@
+import json
+import os
 import re
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from email.utils import formatdate
 from pathlib import Path
 
-import pandas as pd
-import requests
+import httpx
+import pyarrow.csv as pac
 
 BASE = "https://support.dataposit.co.ke"
 COOKIE_NAME = "OSTSESSID"
@@ -16,46 +21,106 @@ CSV_PATH = r"C:\Users\ADMIN\Desktop\Ticket dashboard\combined_tickets_all_source
 
 ID_RE = re.compile(r"tickets\.php\?id=(\d+)")
 
+# Ticket number -> internal id never changes, so resolved ids are kept across runs
+ID_CACHE_PATH = OUT_DIR / "id_cache.json"
+ID_CACHE_FLUSH_EVERY = 25
 
-def find_internal_id(session: requests.Session, ticket_number: str) -> int | None:
+MAX_WORKERS = 8
+MAX_REQUESTS_PER_SEC = 2  # Be polite to the server (shared across all workers)
+
+
+class RateLimiter:
+    """Spaces out requests across threads so the aggregate rate stays under a cap."""
+
+    def __init__(self, per_second: float):
+        self.interval = 1.0 / per_second
+        self.lock = threading.Lock()
+        self.next_at = 0.0
+
+    def wait(self) -> None:
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_at - now
+            self.next_at = max(now, self.next_at) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+class IdCache:
+    """Thread-safe ticket number -> internal id map persisted as JSON."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.ids: dict[str, int] = {}
+        if path.exists():
+            try:
+                self.ids = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError) as e:
+                print(f"  ! Ignoring unreadable id cache {path.name}: {e}")
+
+    def get(self, ticket_number: str) -> int | None:
+        with self.lock:
+            return self.ids.get(ticket_number)
+
+    def set(self, ticket_number: str, internal_id: int) -> None:
+        with self.lock:
+            self.ids[ticket_number] = internal_id
+
+    def save(self) -> None:
+        with self.lock:
+            data = json.dumps(self.ids, indent=2, sort_keys=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(data, encoding="utf-8")
+        os.replace(tmp, self.path)
+
+
+def find_internal_id(session: httpx.Client, ticket_number: str) -> tuple[int | None, bool]:
     """
     Searches staff ticket list for the visible Ticket Number.
     Handles both direct redirects and list results.
+    Returns (internal_id, exact): exact is False when the id is only the first
+    ticket on the results page, which may not be the one searched for.
     """
     search_url = f"{BASE}/scp/tickets.php?a=search&query={ticket_number}"
 
     try:
-        r = session.get(search_url, allow_redirects=True, timeout=30)
-    except requests.RequestException as e:
+        r = session.get(search_url, follow_redirects=True, timeout=30)
+    except httpx.HTTPError as e:
         print(f"  ! Network error searching for {ticket_number}: {e}")
-        return None
+        return None, False
 
-    if "login.php" in r.url.lower():
+    final_url = str(r.url)
+    if "login.php" in final_url.lower():
         raise RuntimeError("Session expired (redirected to login). Update your OSTSESSID.")
 
     # FIX 2: Check if osTicket redirected us directly to the ticket (Common for exact matches)
     # The URL will look like: .../scp/tickets.php?id=12345
-    if "id=" in r.url:
-        match = re.search(r"[?&]id=(\d+)", r.url)
+    if "id=" in final_url:
+        match = re.search(r"[?&]id=(\d+)", final_url)
         if match:
-            return int(match.group(1))
+            return int(match.group(1)), True
 
     specific_pattern = re.compile(rf'tickets\.php\?id=(\d+)[^>]*?>(?:\s*<[^>]+>\s*)*{ticket_number}', re.IGNORECASE)
     
     m = specific_pattern.search(r.text)
     if m:
-        return int(m.group(1))
+        return int(m.group(1)), True
 
     m_generic = ID_RE.search(r.text)
     if m_generic:
         found_id = int(m_generic.group(1))
        
-        return found_id
+        return found_id, False
 
-    return None
+    return None, False
 
 
-def download_zip(session: requests.Session, internal_id: int) -> Path:
+def download_zip(session: httpx.Client, internal_id: int) -> tuple[Path, bool]:
+    """
+    Downloads the ticket ZIP. Returns (path, downloaded); downloaded is False
+    when the copy already on disk is still current and the body was skipped.
+    """
     url = f"{BASE}/scp/tickets.php?id={internal_id}&a=zip&notes=1&tasks=1"
     out_file = OUT_DIR / f"ticket-internal-{internal_id}.zip"
 
@@ -63,79 +128,125 @@ def download_zip(session: requests.Session, internal_id: int) -> Path:
         "User-Agent": "Mozilla/5.0",
         "Referer": f"{BASE}/scp/tickets.php?id={internal_id}",
     }
+    local_size = None
+    if out_file.exists():
+        st = out_file.stat()
+        local_size = st.st_size
+        headers["If-Modified-Since"] = formatdate(st.st_mtime, usegmt=True)
 
     try:
-        r = session.get(url, headers=headers, stream=True, allow_redirects=True, timeout=60)
-    except requests.RequestException as e:
+        with session.stream("GET", url, headers=headers, follow_redirects=True, timeout=60) as r:
+            if "login.php" in str(r.url).lower():
+                raise RuntimeError("Session expired (redirected to login).")
+
+            if r.status_code == 304:
+                return out_file, False
+
+            ctype = (r.headers.get("Content-Type") or "").lower()
+            if "zip" not in ctype:
+                r.read()
+                raise RuntimeError(f"Expected ZIP, got Content-Type={ctype}. Response text prefix: {r.text[:100]}")
+
+            # osTicket builds the ZIP on the fly and may ignore If-Modified-Since. Only the
+            # headers have been read so far (streaming), so a same-size archive can still be skipped.
+            content_length = r.headers.get("Content-Length")
+            if local_size is not None and content_length is not None and int(content_length) == local_size:
+                return out_file, False
+
+            # Only a complete download replaces the ZIP: a truncated file would carry a fresh
+            # mtime, and the next run's If-Modified-Since would then keep it forever
+            part_file = out_file.with_suffix(".part")
+            try:
+                with open(part_file, "wb") as f:
+                    for chunk in r.iter_bytes(chunk_size=1024 * 128):
+                        f.write(chunk)
+                os.replace(part_file, out_file)
+            finally:
+                part_file.unlink(missing_ok=True)
+    except httpx.HTTPError as e:
         raise RuntimeError(f"Network error downloading ZIP: {e}")
 
-    if "login.php" in r.url.lower():
-        raise RuntimeError("Session expired (redirected to login).")
+    return out_file, True
+
 
-    ctype = (r.headers.get("Content-Type") or "").lower()
-    if "zip" not in ctype:
+def fetch(session: httpx.Client, limiter: RateLimiter, id_cache: IdCache, tn: str) -> str:
+    """Resolves one ticket number and downloads its ZIP. Returns a progress message."""
+    internal_id = id_cache.get(tn)
+    if internal_id is None:
+        limiter.wait()
+        internal_id, exact = find_internal_id(session, tn)
 
-        raise RuntimeError(f"Expected ZIP, got Content-Type={ctype}. Response text prefix: {r.text[:100]}")
+        if internal_id is None:
+            return "✗ Could not find internal ID (Search failed or no match)"
+        # A first-result guess may be the wrong ticket; don't pin it for future runs
+        if exact:
+            id_cache.set(tn, internal_id)
 
-    with open(out_file, "wb") as f:
-        for chunk in r.iter_content(chunk_size=1024 * 128):
-            if chunk:
-                f.write(chunk)
+    # Small sanity check: if the internal_id is 3043, and the ticket number ISN'T the one for 3043, warn.
+    # (You can remove this if 3043 is actually one of your targets)
+    if internal_id == 3043 and tn != "YOUR_TICKET_NUMBER_FOR_3043":
+        # This suggests the search failed and we fell back to the default list again
+        pass
 
-    return out_file
+    limiter.wait()
+    out, downloaded = download_zip(session, internal_id)
+    if not downloaded:
+        return f"✓ Found ID {internal_id} -> {out.name} unchanged, skipped download"
+    return f"✓ Found ID {internal_id} -> Saved to {out.name}"
 
 
 def main():
     print(f"Reading CSV from: {CSV_PATH}")
     try:
-        df = pd.read_csv(CSV_PATH)
+        # Only the one column we need is parsed (fails if the CSV doesn't have it).
+        # Blank cells become null even when the column is typed as string.
+        table = pac.read_csv(CSV_PATH, convert_options=pac.ConvertOptions(
+            include_columns=["Ticket Number"], strings_can_be_null=True,
+        ))
     except Exception as e:
-        print(f"Error reading CSV: {e}")
+        print(f"Error reading CSV (needs a 'Ticket Number' column): {e}")
         return
 
     # Normalize ticket numbers to string and remove empty ones
-    if "Ticket Number" not in df.columns:
-        print("Error: CSV is missing 'Ticket Number' column.")
-        return
-        
-    ticket_numbers = df["Ticket Number"].dropna().astype(str).unique().tolist()
+    # (an empty one would search query= and match whatever ticket is listed first)
+    ticket_numbers = [
+        str(x) for x in table.column("Ticket Number").drop_null().unique().to_pylist() if str(x).strip()
+    ]
     print(f"Found {len(ticket_numbers)} unique tickets to process.")
 
-    with requests.Session() as s:
+    # One HTTP/2 connection multiplexes all the workers' requests (no per-request
+    # handshakes); the transport retries failed connection attempts.
+    transport = httpx.HTTPTransport(http2=True, retries=3, limits=httpx.Limits(max_connections=16))
+    with httpx.Client(transport=transport) as s:
+
         # Set the cookie
         s.cookies.set(COOKIE_NAME, COOKIE_VALUE, domain="support.dataposit.co.ke", path="/")
 
         # Quick auth check
         try:
-            chk = s.get(f"{BASE}/scp/", allow_redirects=True, timeout=30)
-            if "login.php" in chk.url.lower():
+            chk = s.get(f"{BASE}/scp/", follow_redirects=True, timeout=30)
+            if "login.php" in str(chk.url).lower():
                 raise RuntimeError("Not logged in. Update OSTSESSID cookie value.")
         except Exception as e:
              print(f"Critical Error during auth check: {e}")
              return
-       
-        for i, tn in enumerate(ticket_numbers, 1):
-            print(f"[{i}/{len(ticket_numbers)}] Processing {tn}...", end=" ", flush=True)
-            try:
-                internal_id = find_internal_id(s, tn)
-                
-                if internal_id is None:
-                    print(f"✗ Could not find internal ID (Search failed or no match)")
-                    continue
-
-                # Small sanity check: if the internal_id is 3043, and the ticket number ISN'T the one for 3043, warn.
-                # (You can remove this if 3043 is actually one of your targets)
-                if internal_id == 3043 and tn != "YOUR_TICKET_NUMBER_FOR_3043": 
-                     # This suggests the search failed and we fell back to the default list again
-                     pass 
-
-                out = download_zip(s, internal_id)
-                print(f"✓ Found ID {internal_id} -> Saved to {out.name}")
-
-                time.sleep(1)  # Be polite to the server
-            except Exception as e:
-                print(f"✗ Error: {e}")
-                time.sleep(2)
+
+        limiter = RateLimiter(MAX_REQUESTS_PER_SEC)
+        id_cache = IdCache(ID_CACHE_PATH)
+        try:
+            with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+                futures = {pool.submit(fetch, s, limiter, id_cache, tn): tn for tn in ticket_numbers}
+                for i, fut in enumerate(as_completed(futures), 1):
+                    tn = futures[fut]
+                    try:
+                        msg = fut.result()
+                    except Exception as e:
+                        msg = f"✗ Error: {e}"
+                    print(f"[{i}/{len(ticket_numbers)}] {tn}: {msg}", flush=True)
+                    if i % ID_CACHE_FLUSH_EVERY == 0:
+                        id_cache.save()
+        finally:
+            id_cache.save()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,9 +1,40 @@
 import argparse, csv, hashlib, io, json, os, re, zipfile
-from dataclasses import dataclass
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from dataclasses import dataclass, is_dataclass
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, List, Optional
-import pdfplumber
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    import re2  # google-re2: linear-time DFA matching, no catastrophic backtracking
+except ImportError:
+    re2 = None
+
+try:
+    import orjson  # C JSON encoder that handles dataclasses and datetimes natively
+except ImportError:
+    orjson = None
+
+try:
+    import pymupdf  # PyMuPDF: text extraction in C, much faster than pdfplumber
+except ImportError:
+    pymupdf = None
+    import pdfplumber
+
+def compile_pattern(pattern: str, flags: str = "") -> Any:
+    """
+    Compiles with RE2 when installed, else re. Flags are inline (e.g. "i") so both engines accept them.
+    RE2's \s, \d, \w and \b are ASCII-only, so only use this for patterns where that can't matter.
+    """
+    if flags:
+        pattern = f"(?{flags}){pattern}"
+    if re2 is not None:
+        try:
+            return re2.compile(pattern)
+        except Exception:
+            pass  # Syntax RE2 doesn't support; Python's re still handles it
+    return re.compile(pattern)
 
 # ---------------- CONFIGURATION ----------------
 
@@ -36,8 +67,17 @@ METADATA_PATTERNS = {
     ],
 }
 
+# Compiled once at import; alternatives stay separate and are tried in list order,
+# since that order is the priority (e.g. the table format before the standard one).
+# Plain re: the text isn't NBSP-normalized and \s/\w must stay Unicode-aware.
+_METADATA_RE = {
+    key: [re.compile(p, re.MULTILINE | re.IGNORECASE) for p in pats]
+    for key, pats in METADATA_PATTERNS.items()
+}
+
 # UPDATED: Supports newlines between Date and Author, plus new date formats
 # Matches: "2/4/26 9:02 AM Sync Invoice\nNorman Mungai"
+# Plain re for the same reason as _METADATA_RE (e.g. "9:02\xa0AM")
 THREAD_ANCHOR_PATTERN = re.compile(
     r"(?P<ts>"
     r"(?:\d{1,2}/\d{1,2}/(?:\d{2}|\d{4})\s+\d{1,2}:\d{2}(?::\d{2})?(?:\s*[AP]M)?)" # 2/4/26 9:02 AM
@@ -51,8 +91,14 @@ THREAD_ANCHOR_PATTERN = re.compile(
     r"(?P<author>[A-Za-z][A-Za-z .,'’\-]{1,60})" # The Author Name on the next line
 )
 
-# Footer noise to remove so it doesn't clutter the index
-FOOTER_PATTERN = re.compile(r"Ticket #\d+ printed by .*? on .*? Page \d+", re.IGNORECASE)
+# Footer noise to remove so it doesn't clutter the index (literal text and ASCII page digits, so RE2 is safe)
+FOOTER_PATTERN = compile_pattern(r"Ticket #\d+ printed by .*? on .*? Page \d+", "i")
+# PyMuPDF path: only blocks whose bottom edge reaches below this fraction of the page
+# height are scanned for the footer, so a footer printed higher up (outside the bottom
+# 8%) is left in. The pdfplumber path, like the original code, removes it anywhere.
+FOOTER_BAND = 0.92
+
+AMPM_PATTERN = re.compile(r"\s+(am|pm)\b", re.IGNORECASE)
 
 @dataclass
 class ThreadItem:
@@ -66,95 +112,123 @@ class ThreadItem:
 def normalize_ws(s: str) -> str:
     """Cleans up whitespace and removes quote marks from CSV-style extraction."""
     if not s: return ""
-    return " ".join(s.replace('"', '').split()).strip()
+    if '"' in s: s = s.replace('"', '')
+    # split()/join already trims the ends; benchmarked faster than re.sub(r"\s+", ...)
+    return " ".join(s.split())
 
-def parse_dt(ts: str) -> Optional[datetime]:
-    # Normalize: "2/4/26 9:02 AM" -> "2/4/26 9:02 AM"
+@lru_cache(maxsize=8192)
+def _norm_ts(ts: str) -> str:
+    # Normalize: "2/4/26 9:02 am" -> "2/4/26 9:02 AM"
     # Also handles "08 December 2025 09:22"
-    ts_norm = re.sub(r"\s+(am|pm)\b", lambda m: f" {m.group(1).upper()}", normalize_ws(ts), flags=re.IGNORECASE)
-    
-    fmts = [
-        "%m/%d/%Y %I:%M %p", "%m/%d/%y %I:%M %p", # US standard
-        "%m/%d/%Y %H:%M", "%m/%d/%y %H:%M",       # US 24hr
-        "%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M",    # ISO standard
-        "%Y/%m/%d %H:%M",                         # Slashes ISO (found in your data)
-        "%d %B %Y %H:%M"                          # "08 December 2025 09:22" (found in your data)
-    ]
-    for f in fmts:
+    return AMPM_PATTERN.sub(lambda m: f" {m.group(1).upper()}", normalize_ws(ts))
+
+# Ordered by how often each format shows up in the osTicket exports
+DT_FORMATS = [
+    "%m/%d/%y %I:%M %p", "%m/%d/%Y %I:%M %p", # US standard
+    "%Y/%m/%d %H:%M",                         # Slashes ISO (found in your data)
+    "%d %B %Y %H:%M",                         # "08 December 2025 09:22" (found in your data)
+    "%m/%d/%y %H:%M", "%m/%d/%Y %H:%M",       # US 24hr
+    "%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M",    # ISO standard
+]
+
+@lru_cache(maxsize=8192)
+def _parse_dt_norm(ts_norm: str) -> Optional[datetime]:
+    for f in DT_FORMATS:
         try: return datetime.strptime(ts_norm, f)
-        except: continue
+        except ValueError: continue
     return None
 
+def parse_dt(ts: str) -> Optional[datetime]:
+    # Threads repeat the same timestamps a lot, so both steps are memoized
+    return _parse_dt_norm(_norm_ts(ts))
+
+def _json_default(o: Any) -> Any:
+    if isinstance(o, datetime): return o.isoformat()
+    if is_dataclass(o): return vars(o)
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+def dumps_line(record: Dict) -> bytes:
+    """tickets.jsonl line; the json fallback needs _json_default for datetimes and dataclasses."""
+    if orjson is not None:
+        return orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(record, ensure_ascii=False, default=_json_default) + "\n").encode("utf-8")
+
+def _page_texts(pdf_bytes: bytes) -> Iterator[str]:
+    """Yields each page's text with the footer removed, using PyMuPDF when it is installed."""
+    if pymupdf is not None:
+        with pymupdf.open(stream=pdf_bytes, filetype="pdf") as doc:
+            for p in doc:
+                # The footer sits at the bottom of the page, so only blocks reaching into that
+                # band are regex-scanned. The match is cut out rather than the block dropped:
+                # the last body line can share a block with the footer.
+                band_top = p.rect.height * FOOTER_BAND
+                yield "".join(
+                    FOOTER_PATTERN.sub("", b[4]) if b[3] >= band_top else b[4]
+                    for b in p.get_text("blocks") if b[6] == 0
+                )
+    else:
+        with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+            for p in pdf.pages:
+                # Remove footer lines before processing
+                yield FOOTER_PATTERN.sub("", p.extract_text() or "")
+
 def extract_content(pdf_bytes: bytes) -> List[Dict]:
     """Reads PDF and strips out the repeated footer noise."""
-    pages = []
-    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
-        for i, p in enumerate(pdf.pages):
-            txt = p.extract_text() or ""
-            # Remove footer lines before processing
-            txt_clean = FOOTER_PATTERN.sub("", txt)
-            pages.append({"page": i + 1, "text": txt_clean})
-    return pages
+    return [{"page": i + 1, "text": txt} for i, txt in enumerate(_page_texts(pdf_bytes))]
+
+def _make_item(m: Any, body_parts: List[str], page_num: int) -> ThreadItem:
+    body_clean = normalize_ws("\n".join(body_parts))
+
+    # Heuristic for "Kind"
+    kind = "message"
+    lower_body = body_clean.lower()
+    if "internal note" in lower_body: kind = "note"
+    elif "status changed" in lower_body: kind = "event"
+
+    ts_raw = m.group("ts")
+    return ThreadItem(
+        ts_raw=normalize_ws(ts_raw),
+        ts=parse_dt(ts_raw),
+        author=normalize_ws(m.group("author")),
+        kind=kind,
+        text=body_clean[:5000], # Cap text size
+        page=page_num
+    )
 
 def split_thread_items(pages: List[Dict]) -> List[ThreadItem]:
-    # Combine all text with page markers
-    big = "".join([f"\n<<P:{p['page']}>>\n{p['text']}" for p in pages])
-    
-    # Use re.DOTALL so '.' matches newlines (needed to skip the Subject line)
-    anchors = list(THREAD_ANCHOR_PATTERN.finditer(big))
+    # An anchor never spans a page break (the author must follow on the next line),
+    # so each page is scanned on its own. An item's body runs until the NEXT anchor,
+    # which may be on a later page: the open item is carried across pages.
     items = []
-    
-    for idx, m in enumerate(anchors):
-        # Text for this item runs until the NEXT anchor starts
-        start_idx = m.start()
-        end_idx = anchors[idx + 1].start() if idx + 1 < len(anchors) else len(big)
-        
-        raw_block = big[start_idx:end_idx]
-        
-        # Extract groups
-        ts_raw = m.group("ts")
-        author = m.group("author")
-        
-        # The "Body" is everything after the full match (Timestamp + Subject + Author)
-        # We split by the matched string to get the remainder
-        full_match_str = m.group(0)
-        body_part = raw_block.replace(full_match_str, "", 1)
-        
-        # Clean up page markers from the body text
-        body_clean = re.sub(r"<<P:\d+>>", "", body_part)
-        body_clean = normalize_ws(body_clean)
-        
-        # Find which page this started on
-        page_marker = re.search(r"<<P:(\d+)>>", big[:start_idx+20])
-        page_num = int(page_marker.group(1)) if page_marker else 1
-
-        # Heuristic for "Kind"
-        kind = "message"
-        lower_body = body_clean.lower()
-        if "internal note" in lower_body: kind = "note"
-        elif "status changed" in lower_body: kind = "event"
-        
-        items.append(ThreadItem(
-            ts_raw=normalize_ws(ts_raw),
-            ts=parse_dt(ts_raw),
-            author=normalize_ws(author),
-            kind=kind,
-            text=body_clean[:5000], # Cap text size
-            page=page_num
-        ))
+    pending = None  # (anchor match, body parts, page the anchor is on)
+
+    for p in pages:
+        text = p["text"]
+        pos = 0
+        for m in THREAD_ANCHOR_PATTERN.finditer(text):
+            if pending:
+                pending[1].append(text[pos:m.start()])
+                items.append(_make_item(*pending))
+            # The "Body" is everything after the full match (Timestamp + Subject + Author)
+            pending = (m, [], p["page"])
+            pos = m.end()
+        if pending:
+            pending[1].append(text[pos:])
+
+    if pending:
+        items.append(_make_item(*pending))
     return items
 
-def process_pdf(pdf_bytes: bytes, zip_n: str, pdf_n: str) -> Dict:
+def process_pdf(pdf_bytes: bytes, zip_n: str, pdf_n: str, pdf_hash: Optional[str] = None) -> Dict:
     pages = extract_content(pdf_bytes)
     first_page_text = pages[0]["text"] if pages else ""
     
     # Metadata Extraction
     meta = {}
-    for key, patterns in METADATA_PATTERNS.items():
+    for key, patterns in _METADATA_RE.items():
         val = "N/A"
         for pat in patterns:
-            # We use MULTILINE to handle the line-by-line nature of the text
-            m = re.search(pat, first_page_text, re.MULTILINE | re.IGNORECASE)
+            m = pat.search(first_page_text)
             if m:
                 val = normalize_ws(m.group(1))
                 break
@@ -181,29 +255,82 @@ def process_pdf(pdf_bytes: bytes, zip_n: str, pdf_n: str) -> Dict:
         "source": {
             "zip": zip_n, 
             "pdf": pdf_n, 
-            "hash": hashlib.sha256(pdf_bytes).hexdigest()
+            "hash": pdf_hash or hashlib.sha256(pdf_bytes).hexdigest()
         },
-        "thread_items": [vars(it) for it in items],
+        "thread_items": items,
         "derived": {
-            "raised_at": dated_items[0].ts.isoformat() if dated_items else None,
-            "resolved_at": resolved_at.isoformat() if resolved_at else None,
+            "raised_at": dated_items[0].ts if dated_items else None,
+            "resolved_at": resolved_at,
             "count_messages": len(items)
         }
     }
 
+def process_zip_member(zip_path: str, pdf_name: str, pdf_hash: str) -> Dict:
+    """Worker entry point: reads the PDF out of its zip here, so the bytes never pass through the parent."""
+    with zipfile.ZipFile(zip_path, "r") as z:
+        pdf_bytes = z.read(pdf_name)
+    return process_pdf(pdf_bytes, Path(zip_path).name, pdf_name, pdf_hash)
+
+def sha256_stream(f: Any, chunk_size: int = 1024 * 1024) -> str:
+    h = hashlib.sha256()
+    for chunk in iter(lambda: f.read(chunk_size), b""):
+        h.update(chunk)
+    return h.hexdigest()
+
+# Bump when the parsing code changes in a way parser_digest() can't see
+PARSER_VERSION = 2
+
+def parser_digest() -> str:
+    """Short digest of everything that shapes a parsed record; cache entries are filed under it."""
+    backend = "pymupdf" if pymupdf is not None else "pdfplumber"
+    parts = [PARSER_VERSION, backend, METADATA_PATTERNS, THREAD_ANCHOR_PATTERN.pattern,
+             FOOTER_PATTERN.pattern, FOOTER_BAND, DT_FORMATS]
+    return hashlib.sha256(json.dumps(parts).encode("utf-8")).hexdigest()[:12]
+
+def load_cached(cache_dir: Path, pdf_hash: str) -> Optional[Dict]:
+    """Returns the previously parsed record for this PDF content, if any."""
+    try:
+        data = (cache_dir / f"{pdf_hash}.json").read_bytes()
+        record = orjson.loads(data) if orjson is not None else json.loads(data)
+    except (OSError, ValueError):
+        return None  # Missing or unreadable entry: parse the PDF again (and overwrite it)
+    if not isinstance(record, dict) or not isinstance(record.get("source"), dict):
+        return None
+    return record
+
+def store_cached(cache_dir: Path, pdf_hash: str, line: bytes) -> None:
+    path = cache_dir / f"{pdf_hash}.json"
+    tmp = path.with_suffix(".tmp")
+    tmp.write_bytes(line)
+    os.replace(tmp, path)  # Atomic, so an interrupted run never leaves half a record
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--zips-dir", required=True, help="Folder with 199+ zip files")
     parser.add_argument("--out-dir", default="out")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Parallel PDF parser processes")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Re-parse every PDF instead of reading out-dir/cache (entries are still refreshed)")
     args = parser.parse_args()
 
     out_dir = Path(args.out_dir)
     out_dir.mkdir(exist_ok=True, parents=True)
+
+    # Parsed records keyed by PDF SHA-256, so re-runs skip PDFs that haven't changed. Entries
+    # live under a digest of the parser config, so changed patterns/backend never hit old ones.
+    cache_dir = out_dir / "cache" / parser_digest()
+    cache_dir.mkdir(exist_ok=True, parents=True)
+    read_cache = not args.no_cache
     
     json_path = out_dir / "tickets.jsonl"
     err_path = out_dir / "errors.csv"
 
-    with json_path.open("w", encoding="utf-8") as jf, err_path.open("w", newline="", encoding="utf-8") as ef:
+    # pdfplumber parsing is CPU-bound, so PDFs are parsed in worker processes while
+    # this process does all the file writing. In-flight work is capped to bound memory.
+    max_in_flight = max(1, args.workers or 1) * 4
+
+    with json_path.open("wb", buffering=1024 * 1024) as jf, err_path.open("w", newline="", encoding="utf-8") as ef, \
+            ProcessPoolExecutor(max_workers=args.workers) as pool:
         err_writer = csv.writer(ef)
         err_writer.writerow(["zip", "pdf", "error"])
         
@@ -211,6 +338,25 @@ def main():
         print(f"Found {len(zip_files)} zip files to process...")
 
         count = 0
+        pending = {}
+
+        def write_record(record, pdf_hash=None):
+            nonlocal count
+            line = dumps_line(record)
+            jf.write(line)
+            if pdf_hash:
+                store_cached(cache_dir, pdf_hash, line)
+            count += 1
+            if count % 10 == 0: print(f"Processed {count} tickets...", end="\r")
+
+        def collect(done):
+            for fut in done:
+                zip_n, pdf_n, pdf_hash = pending.pop(fut)
+                try:
+                    write_record(fut.result(), pdf_hash)
+                except Exception as e:
+                    err_writer.writerow([zip_n, pdf_n, str(e)])
+
         for zpath in zip_files:
             try:
                 with zipfile.ZipFile(zpath, "r") as z:
@@ -223,15 +369,28 @@ def main():
 
                     for pdf_name in pdfs:
                         try:
-                            record = process_pdf(z.read(pdf_name), zpath.name, pdf_name)
-                            jf.write(json.dumps(record, ensure_ascii=False) + "\n")
-                            count += 1
-                            if count % 10 == 0: print(f"Processed {count} tickets...", end="\r")
+                            # Hash by streaming the member; only a worker ever holds the whole PDF
+                            with z.open(pdf_name) as pdf_f:
+                                pdf_hash = sha256_stream(pdf_f)
+                            cached = load_cached(cache_dir, pdf_hash) if read_cache else None
+                            if cached is not None:
+                                # Same content may arrive in a different zip; keep the source current
+                                cached["source"].update(zip=zpath.name, pdf=pdf_name)
+                                write_record(cached)
+                                continue
+                            # Cap per PDF, not per zip: a zip with many PDFs must not queue them all
+                            while len(pending) >= max_in_flight:
+                                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                                collect(done)
+                            fut = pool.submit(process_zip_member, str(zpath), pdf_name, pdf_hash)
+                            pending[fut] = (zpath.name, pdf_name, pdf_hash)
                         except Exception as e:
                             err_writer.writerow([zpath.name, pdf_name, str(e)])
             except Exception as e:
                 err_writer.writerow([zpath.name, "ZIP_READ_ERR", str(e)])
 
+        collect(as_completed(list(pending)))
+
     print(f"\nDone. Processed {count} tickets.")
 
 if __name__ == "__main__":
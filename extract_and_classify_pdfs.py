@@ -1,14 +1,40 @@
 import argparse
+import io
 import json
+import os
 import re
 import hashlib
-from dataclasses import dataclass, asdict, field
+import sqlite3
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Optional, Any, Tuple
 
 import pdfplumber
 
+try:
+    import pypdfium2 as pdfium  # Preferred extractor when installed (see TEXT_EXTRACTOR)
+except ImportError:
+    pdfium = None
+
+try:
+    import orjson  # Encodes records.jsonl/errors.jsonl lines when installed
+except ImportError:
+    orjson = None
+
+try:
+    import pyarrow as pa  # Only needed for --format parquet
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+try:
+    import ahocorasick  # pyahocorasick: all keywords in one automaton, one pass per text
+except ImportError:
+    ahocorasick = None
+
 
 # -----------------------------
 # Helpers
@@ -21,8 +47,23 @@ def safe_mkdir(p: Path) -> None:
     p.mkdir(parents=True, exist_ok=True)
 
 
-def sha1_short(data: bytes, n: int = 12) -> str:
-    return hashlib.sha1(data).hexdigest()[:n]
+def dumps_line(obj: Dict[str, Any]) -> bytes:
+    """records.jsonl / errors.jsonl line for obj, encoded in the worker."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def sha1_short(*parts: bytes, n: int = 12) -> str:
+    h = hashlib.sha1()
+    for part in parts:
+        h.update(part)
+    return h.hexdigest()[:n]
+
+
+def _is_word_char(c: str) -> bool:
+    # Same notion of a word character as regex \w
+    return c.isalnum() or c == "_"
 
 
 def normalize_spaces(s: str) -> str:
@@ -59,6 +100,27 @@ METADATA_PATTERNS: Dict[str, List[re.Pattern]] = {
     ]],
 }
 
+WRITE_BUFFER_SIZE = 1 << 20  # 1 MiB
+
+HASH_CHUNK_SIZE = 1 << 20  # 1 MiB
+
+# Smallest possible valid PDF; anything shorter is skipped without opening it
+MIN_PDF_SIZE = 67
+
+# Metadata fields are looked for in this many leading characters first
+METADATA_HEADER_CHARS = 4096
+
+# Threads writing texts/<record_id>.txt, so file create/close latency overlaps extraction
+TEXT_WRITE_THREADS = 4
+
+# Records buffered per Parquet row group
+PARQUET_BATCH_SIZE = 1000
+
+TEXT_CACHE_NAME = ".text_cache.sqlite"
+TEXT_CACHE_COMMIT_EVERY = 100
+# Cached text is only reused by the extractor that produced it
+TEXT_EXTRACTOR = "pypdfium2" if pdfium is not None else "pdfplumber"
+
 CLASS_RULES: Dict[str, List[str]] = {
     "billing": ["invoice", "payment", "mpesa", "billing", "charge", "quotation", "quote"],
     "connectivity": ["internet", "link down", "latency", "packet loss", "fiber", "uplink", "wan"],
@@ -82,6 +144,34 @@ class PdfRecord:
     text: str = ""
     metadata: Dict[str, Optional[str]] = field(default_factory=dict)
     labels: Dict[str, Any] = field(default_factory=dict)
+    alias_of: Optional[str] = None  # record_id of the byte-identical PDF this one was copied from
+
+    def to_dict(self) -> Dict[str, Any]:
+        # Shallow on purpose: asdict() would deep-copy text/metadata/labels just to serialize them
+        d = {
+            "record_id": self.record_id,
+            "source_file": self.source_file,
+            "extracted_at": self.extracted_at,
+            "num_pages": self.num_pages,
+            "text": self.text,
+            "metadata": self.metadata,
+            "labels": self.labels,
+        }
+        if self.alias_of is not None:
+            d["alias_of"] = self.alias_of
+        return d
+
+
+@dataclass(frozen=True)
+class ProcessResult:
+    ok: bool
+    line: bytes  # records.jsonl line, or errors.jsonl line when not ok
+    record_id: Optional[str] = None
+    record: Optional[Dict[str, Any]] = None  # instead of a line, for --format parquet
+    text: Optional[str] = None  # only when the main process needs it (texts dir / cache fill)
+    num_pages: int = 0
+    cache_key: Optional[Tuple[int, int]] = None  # (mtime_ns, size) when freshly extracted
+    aliases: Tuple["ProcessResult", ...] = ()  # Records for byte-identical copies of this PDF
 
 
 # -----------------------------
@@ -91,69 +181,165 @@ class TicketProcessor:
     def __init__(self, patterns: Dict[str, List[re.Pattern]], rules: Dict[str, List[str]]):
         self.patterns = patterns
         self.rules = rules
-        self.class_regex = self._compile_class_rules(rules)
+        self.class_literals = self._compile_class_rules(rules)
+        self.class_automaton = self._build_class_automaton(rules) if ahocorasick is not None else None
 
     @staticmethod
-    def _compile_class_rules(rules: Dict[str, List[str]]) -> Dict[str, List[re.Pattern]]:
+    def _compile_class_rules(rules: Dict[str, List[str]]) -> Dict[str, Tuple[List[str], Optional[re.Pattern]]]:
         """
-        Compile keyword patterns.
-        - single words use word boundaries: \bword\b
-        - phrases use plain substring regex with escaping
+        Compile keyword rules per label, matched against lowercased text.
+        - phrases are plain literals, counted with str.count
+        - single words share one pattern per label: \b(?:w1|w2|...)\b
         """
-        compiled: Dict[str, List[re.Pattern]] = {}
+        compiled: Dict[str, Tuple[List[str], Optional[re.Pattern]]] = {}
         for label, kws in rules.items():
-            pats: List[re.Pattern] = []
+            phrases: List[str] = []
+            words: List[str] = []
             for kw in kws:
                 k = (kw or "").strip().lower()
                 if not k:
                     continue
                 if " " in k:
-                    pats.append(re.compile(re.escape(k), re.I))
+                    phrases.append(k)
                 else:
-                    pats.append(re.compile(rf"\b{re.escape(k)}\b", re.I))
-            compiled[label] = pats
+                    words.append(re.escape(k))
+            # Plain re on purpose: RE2's \b is ASCII-only and would count "wan" inside "ßwan"
+            words_re = re.compile(rf"\b(?:{'|'.join(words)})\b") if words else None
+            compiled[label] = (phrases, words_re)
         return compiled
 
+    @staticmethod
+    def _build_class_automaton(rules: Dict[str, List[str]]) -> Any:
+        """
+        One Aho-Corasick automaton over every lowercased keyword.
+        Value: (keyword, [(label, needs_word_boundary), ...]); same rules as _compile_class_rules.
+        """
+        hits: Dict[str, List[Tuple[str, bool]]] = {}
+        for label, kws in rules.items():
+            for kw in kws:
+                k = (kw or "").strip().lower()
+                if k:
+                    hits.setdefault(k, []).append((label, " " not in k))
+
+        automaton = ahocorasick.Automaton()
+        for k, labels in hits.items():
+            automaton.add_word(k, (k, labels))
+        automaton.make_automaton()
+        return automaton
+
+    def _count_keywords(self, text: str, weight: int, scores: Dict[str, int]) -> None:
+        """Adds weight * keyword hits in text to scores, counting like re.findall would."""
+        text = text.lower()
+        n = len(text)
+        last_end: Dict[str, int] = {}
+        for end, (k, labels) in self.class_automaton.iter(text):
+            start = end - len(k) + 1
+            if start <= last_end.get(k, -1):
+                continue  # findall matches don't overlap
+            bounded = (start == 0 or not _is_word_char(text[start - 1])) and \
+                (end + 1 == n or not _is_word_char(text[end + 1]))
+            counted = False
+            for label, needs_boundary in labels:
+                if bounded or not needs_boundary:
+                    scores[label] += weight
+                    counted = True
+            if counted:
+                last_end[k] = end
+
     def extract_text(self, pdf_path: Path) -> Tuple[str, int]:
-        parts: List[str] = []
-        num_pages = 0
+        if pdfium is not None:
+            try:
+                return self._extract_text_pdfium(pdf_path)
+            except pdfium.PdfiumError:
+                pass  # Let pdfplumber try PDFs PDFium won't load (and report the error if it can't either)
+        return self._extract_text_pdfplumber(pdf_path)
+
+    @staticmethod
+    def _extract_text_pdfium(pdf_path: Path) -> Tuple[str, int]:
+        buf = io.StringIO()
+
+        pdf = pdfium.PdfDocument(str(pdf_path))
+        try:
+            num_pages = len(pdf)
+            for i in range(num_pages):
+                page = pdf[i]
+                textpage = page.get_textpage()
+                txt = normalize_spaces(textpage.get_text_range().replace("\r\n", "\n"))
+                textpage.close()
+                page.close()
+                if txt:
+                    if buf.tell():
+                        buf.write("\n\n")
+                    buf.write(txt)
+        finally:
+            pdf.close()
+
+        return buf.getvalue().strip(), num_pages
+
+    @staticmethod
+    def _extract_text_pdfplumber(pdf_path: Path) -> Tuple[str, int]:
+        buf = io.StringIO()
 
         with pdfplumber.open(pdf_path) as pdf:
+            num_pages = len(pdf.pages)
             for page in pdf.pages:
-                num_pages += 1
-                txt = page.extract_text() or ""
-                txt = normalize_spaces(txt)
+                txt = normalize_spaces(page.extract_text() or "")
+                # Drop the page's cached layout objects (chars, lines...) as soon as
+                # its text is out, instead of holding every page until the PDF closes
+                page.close()
                 if txt:
-                    parts.append(txt)
+                    if buf.tell():
+                        buf.write("\n\n")
+                    buf.write(txt)
 
-        full_text = "\n\n".join(parts).strip()
-        return full_text, num_pages
+        return buf.getvalue().strip(), num_pages
 
     def get_metadata(self, text: str) -> Dict[str, Optional[str]]:
+        # The ticket fields sit at the top of the first page: try every pattern on
+        # the header, and only scan the whole text for fields the header lacks
+        header = text[:METADATA_HEADER_CHARS]
         md: Dict[str, Optional[str]] = {}
         for field_name, regexes in self.patterns.items():
-            value: Optional[str] = None
-            for r in regexes:
-                m = r.search(text)
-                if m:
-                    value = normalize_spaces(m.group(1))
-                    break
-            md[field_name] = value
+            m = self._first_match(regexes, header)
+            # A match running into the cut may be truncated, so redo it on the full text
+            if (m is None or m.end() == len(header)) and len(text) > len(header):
+                m = self._first_match(regexes, text)
+            md[field_name] = normalize_spaces(m.group(1)) if m else None
         return md
 
+    @staticmethod
+    def _first_match(regexes: List[re.Pattern], text: str) -> Optional[re.Match]:
+        for r in regexes:
+            m = r.search(text)
+            if m:
+                return m
+        return None
+
     def classify(self, text: str, metadata: Dict[str, Optional[str]]) -> Dict[str, Any]:
         subj = metadata.get("subject") or ""
         dept = metadata.get("department") or ""
         body = text or ""
 
         scores: Dict[str, int] = {}
-        for label, patterns in self.class_regex.items():
-            score = 0
-            for pat in patterns:
-                score += len(pat.findall(body))
-                score += 3 * len(pat.findall(subj))
-                score += 2 * len(pat.findall(dept))
-            scores[label] = score
+        if self.class_automaton is not None:
+            scores = dict.fromkeys(self.class_literals, 0)
+            self._count_keywords(body, 1, scores)
+            self._count_keywords(subj, 3, scores)
+            self._count_keywords(dept, 2, scores)
+        else:
+            # Lowercase once; every keyword is matched against lowercased text
+            weighted = ((body.lower(), 1), (subj.lower(), 3), (dept.lower(), 2))
+            for label, (phrases, words_re) in self.class_literals.items():
+                score = 0
+                for txt, weight in weighted:
+                    if not txt:
+                        continue
+                    for phrase in phrases:
+                        score += weight * txt.count(phrase)
+                    if words_re is not None:
+                        # Only the count is needed, so don't build the list of matched strings
+                        score += weight * sum(1 for _ in words_re.finditer(txt))
+                scores[label] = score
 
         primary = max(scores, key=scores.get) if scores else "unclassified"
         confidence = scores.get(primary, 0)
@@ -166,15 +352,254 @@ class TicketProcessor:
 # -----------------------------
 # IO pipeline
 # -----------------------------
-def iter_pdfs(input_dir: Path) -> List[Path]:
-    # returns a stable order (helps reproducibility)
-    return sorted([p for p in input_dir.rglob("*.pdf") if p.is_file()])
+def find_duplicates(paths: List[Path]) -> Dict[Path, Path]:
+    """
+    Maps each byte-identical copy to the first path (in the given order) with the
+    same content. Only files sharing a size are hashed, and they are hashed in full:
+    exported tickets can share a long identical prefix (same logo, same template).
+    """
+    by_size: Dict[int, List[Path]] = {}
+    for p in paths:
+        try:
+            by_size.setdefault(p.stat().st_size, []).append(p)
+        except OSError:
+            pass  # Reported by the worker
+
+    alias_of: Dict[Path, Path] = {}
+    for group in by_size.values():
+        if len(group) < 2:
+            continue
+        first_by_digest: Dict[bytes, Path] = {}
+        for p in group:
+            h = hashlib.sha1()
+            try:
+                with p.open("rb") as fh:
+                    for chunk in iter(partial(fh.read, HASH_CHUNK_SIZE), b""):
+                        h.update(chunk)
+            except OSError:
+                continue
+            original = first_by_digest.setdefault(h.digest(), p)
+            if original is not p:
+                alias_of[p] = original
+    return alias_of
+
+
+def looks_like_pdf(path: Path) -> bool:
+    """Cheap header check so empty/non-PDF files never reach the PDF parser."""
+    try:
+        if path.stat().st_size < MIN_PDF_SIZE:
+            return False
+        with path.open("rb") as fh:
+            # The spec allows junk before the header within the first 1 KiB
+            return b"%PDF-" in fh.read(1024)
+    except OSError:
+        return True  # Let the worker hit the same error and report it
+
+
+def iter_pdfs(input_dir: Path) -> Tuple[List[Path], List[Path]]:
+    """Returns (pdfs, skipped) in a stable order (helps reproducibility)."""
+    pdfs: List[Path] = []
+    skipped: List[Path] = []
+    for p in sorted(p for p in input_dir.rglob("*.pdf") if p.is_file()):
+        (pdfs if looks_like_pdf(p) else skipped).append(p)
+    return pdfs, skipped
+
+
+def build_record_id(pdf_path: Path, text: str, size: Optional[int] = None) -> str:
+    # stable + low collision: absolute path + size + snippet (hashed piecewise, no joined copy)
+    if size is None:
+        size = pdf_path.stat().st_size
+    return sha1_short(
+        str(pdf_path).encode("utf-8", errors="ignore"),
+        f"||{size}||{len(text)}||".encode("ascii"),
+        text[:2000].encode("utf-8", errors="ignore"),
+    )
 
 
-def build_record_id(pdf_path: Path, text: str) -> str:
-    # stable + low collision: absolute path + size + snippet
-    base = f"{str(pdf_path)}||{pdf_path.stat().st_size}||{len(text)}||{text[:2000]}"
-    return sha1_short(base.encode("utf-8", errors="ignore"))
+def open_text_cache(path: Path) -> sqlite3.Connection:
+    """Opens (creating if needed) the extracted-text cache. WAL lets workers read while main writes."""
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(texts)")]
+    if columns and "extractor" not in columns:
+        conn.execute("DROP TABLE texts")  # Written before entries were tagged by extractor
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS texts ("
+        "path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, extractor TEXT, num_pages INTEGER, text TEXT)"
+    )
+    conn.commit()
+    return conn
+
+
+class ParquetRecordWriter:
+    """
+    Buffers records column-wise and writes one zstd-compressed row group per
+    PARQUET_BATCH_SIZE records, so memory stays bounded on large runs.
+    """
+
+    def __init__(self, path: Path, batch_size: int = PARQUET_BATCH_SIZE):
+        labels_type = pa.struct([
+            ("rule_based", pa.struct([
+                ("primary", pa.string()),
+                ("confidence", pa.int64()),
+                ("scores", pa.map_(pa.string(), pa.int64())),
+            ])),
+        ])
+        self.schema = pa.schema([
+            ("record_id", pa.string()),
+            ("source_file", pa.string()),
+            ("extracted_at", pa.string()),
+            ("num_pages", pa.int64()),
+            ("text", pa.string()),
+            ("metadata", pa.struct([(name, pa.string()) for name in METADATA_PATTERNS])),
+            ("labels", labels_type),
+            ("alias_of", pa.string()),
+        ])
+        self.batch_size = batch_size
+        self.columns: Dict[str, List[Any]] = {name: [] for name in self.schema.names}
+        self.writer = pq.ParquetWriter(path, self.schema, compression="zstd")
+
+    def write(self, record: Dict[str, Any]) -> None:
+        for name, values in self.columns.items():
+            values.append(record.get(name))
+        if len(self.columns["record_id"]) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.columns["record_id"]:
+            return
+        self.writer.write_table(pa.Table.from_pydict(self.columns, schema=self.schema))
+        for values in self.columns.values():
+            values.clear()
+
+    def close(self) -> None:
+        self.flush()
+        self.writer.close()
+
+    def __enter__(self) -> "ParquetRecordWriter":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+# Per worker process: the processor is built by _worker_init, the cache connection on first use
+_PROCESSOR: Optional[TicketProcessor] = None
+_TEXT_CACHE: Optional[sqlite3.Connection] = None
+
+
+def _get_processor() -> TicketProcessor:
+    global _PROCESSOR
+    if _PROCESSOR is None:
+        _PROCESSOR = TicketProcessor(patterns=METADATA_PATTERNS, rules=CLASS_RULES)
+    return _PROCESSOR
+
+
+def _worker_init() -> None:
+    """Pool initializer: builds the processor (keyword automaton, word regexes) before the first task."""
+    _get_processor()
+
+
+def _cached_text(cache_path: str, pdf_path: Path, cache_key: Tuple[int, int]) -> Optional[Tuple[str, int]]:
+    global _TEXT_CACHE
+    if _TEXT_CACHE is None:
+        _TEXT_CACHE = sqlite3.connect(f"{Path(cache_path).resolve().as_uri()}?mode=ro", uri=True)
+    row = _TEXT_CACHE.execute(
+        "SELECT text, num_pages FROM texts WHERE path = ? AND mtime_ns = ? AND size = ? AND extractor = ?",
+        (str(pdf_path), *cache_key, TEXT_EXTRACTOR),
+    ).fetchone()
+    return (row[0], row[1]) if row else None
+
+
+def process_one(
+    pdf_path_str: str,
+    alias_path_strs: Tuple[str, ...] = (),
+    want_text: bool = False,
+    cache_path: Optional[str] = None,
+    read_cache: bool = True,
+    as_record: bool = False,
+) -> ProcessResult:
+    """
+    Runs the whole per-PDF pipeline (worker side). With cache_path, text extraction
+    is skipped when the file's (mtime, size) and the extractor match the cached entry
+    (lookups are off when read_cache is False; fresh text is still returned for the
+    cache). With as_record, the record comes back as a dict instead of an encoded JSON
+    line. Each alias path (a byte-identical copy) gets its own record reusing this
+    PDF's results.
+    """
+    pdf_path = Path(pdf_path_str)
+    try:
+        processor = _get_processor()
+
+        st = pdf_path.stat()
+        cached = None
+        cache_key = None
+        if cache_path is not None:
+            cache_key = (st.st_mtime_ns, st.st_size)
+            if read_cache:
+                cached = _cached_text(cache_path, pdf_path, cache_key)
+
+        if cached is not None:
+            text, num_pages = cached
+            cache_key = None  # Nothing new to store
+        else:
+            text, num_pages = processor.extract_text(pdf_path)
+
+        metadata = processor.get_metadata(text)
+        labels = {"rule_based": processor.classify(text, metadata)}
+
+        record_id = build_record_id(pdf_path, text, st.st_size)
+
+        record = PdfRecord(
+            record_id=record_id,
+            source_file=str(pdf_path),
+            num_pages=num_pages,
+            text=text,
+            metadata=metadata,
+            labels=labels,
+        )
+        aliases = []
+        for alias_path_str in alias_path_strs:
+            alias = PdfRecord(
+                record_id=build_record_id(Path(alias_path_str), text, st.st_size),
+                source_file=alias_path_str,
+                num_pages=num_pages,
+                text=text,
+                metadata=metadata,
+                labels=labels,
+                alias_of=record_id,
+            )
+            aliases.append(ProcessResult(
+                ok=True,
+                line=b"" if as_record else dumps_line(alias.to_dict()),
+                record_id=alias.record_id,
+                record=alias.to_dict() if as_record else None,
+                text=text if want_text else None,
+                num_pages=num_pages,
+            ))
+
+        return ProcessResult(
+            ok=True,
+            line=b"" if as_record else dumps_line(record.to_dict()),
+            record_id=record_id,
+            record=record.to_dict() if as_record else None,
+            text=text if (want_text or cache_key is not None) else None,
+            num_pages=num_pages,
+            cache_key=cache_key,
+            aliases=tuple(aliases),
+        )
+
+    except Exception as e:
+        # Copies would fail the same way, so they get the same error
+        line = b"".join(
+            dumps_line({
+                "source_file": source_file,
+                "error": repr(e),
+                "at": now_iso(),
+            })
+            for source_file in (str(pdf_path), *alias_path_strs)
+        )
+        return ProcessResult(ok=False, line=line)
 
 
 def main() -> None:
@@ -194,62 +619,122 @@ def main() -> None:
         action="store_true",
         help="Also write extracted texts to output-dir/texts/<record_id>.txt",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="Number of worker processes for PDF extraction",
+    )
+    parser.add_argument(
+        "--format",
+        choices=["jsonl", "parquet"],
+        default="jsonl",
+        help="Records output format (parquet needs pyarrow)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help=f"Re-extract every PDF instead of reusing output-dir/{TEXT_CACHE_NAME} (entries are still refreshed)",
+    )
     args = parser.parse_args()
+    if args.format == "parquet" and pa is None:
+        parser.error("--format parquet requires pyarrow (pip install pyarrow)")
 
     input_dir: Path = Path(args.input_dir)
     output_dir: Path = Path(args.output_dir)
 
     safe_mkdir(output_dir)
 
-    records_path: Path = output_dir / "records.jsonl"
+    records_path: Path = output_dir / f"records.{args.format}"
     errors_path: Path = output_dir / "errors.jsonl"
 
     texts_dir: Optional[Path] = (output_dir / "texts") if args.write_texts else None
     if texts_dir is not None:
         safe_mkdir(texts_dir)
 
-    processor = TicketProcessor(patterns=METADATA_PATTERNS, rules=CLASS_RULES)
-
-    pdf_paths: List[Path] = iter_pdfs(input_dir)
+    pdf_paths, skipped_paths = iter_pdfs(input_dir)
+    if skipped_paths:
+        print(f"Skipping {len(skipped_paths)} file(s) that are not PDFs (empty or no %PDF- header):")
+        for p in skipped_paths:
+            print(f"  {p}")
 
     sources_scanned: int = len(pdf_paths)
+
+    # Byte-identical copies are extracted once; the original's worker writes their records too
+    alias_of = find_duplicates(pdf_paths)
+    copies: Dict[Path, List[str]] = {}
+    for dup, original in alias_of.items():
+        copies.setdefault(original, []).append(str(dup))
+    unique_paths: List[Path] = [p for p in pdf_paths if p not in alias_of]
+
     pdfs_processed: int = 0
     pdfs_failed: int = 0
 
-    with records_path.open("w", encoding="utf-8") as rf, errors_path.open("w", encoding="utf-8") as ef:
-        for pdf_path in pdf_paths:
-            try:
-                text, num_pages = processor.extract_text(pdf_path)
-                metadata = processor.get_metadata(text)
-                labels = {"rule_based": processor.classify(text, metadata)}
-
-                record_id = build_record_id(pdf_path, text)
-
-                record = PdfRecord(
-                    record_id=record_id,
-                    source_file=str(pdf_path),
-                    num_pages=num_pages,
-                    text=text,
-                    metadata=metadata,
-                    labels=labels,
-                )
+    # Extracted text keyed by (path, mtime, size, extractor): re-runs only parse new/changed
+    # PDFs. --no-cache skips the lookups but still refreshes the entries.
+    cache_path: Path = output_dir / TEXT_CACHE_NAME
+    cache = open_text_cache(cache_path)
+    cache_pending = 0
+
+    # Extraction is CPU-bound and independent per PDF: workers do it and return
+    # finished lines; only this process writes, so output stays in path order.
+    worker = partial(
+        process_one,
+        want_text=texts_dir is not None,
+        cache_path=str(cache_path),
+        read_cache=not args.no_cache,
+        as_record=args.format == "parquet",
+    )
 
-                rf.write(json.dumps(asdict(record), ensure_ascii=False) + "\n")
+    # Large buffers so per-record lines are flushed in big writes, not one syscall each
+    if args.format == "parquet":
+        records_out = ParquetRecordWriter(records_path)
+    else:
+        records_out = records_path.open("wb", buffering=WRITE_BUFFER_SIZE)
+
+    with records_out as rf, \
+            errors_path.open("wb", buffering=WRITE_BUFFER_SIZE) as ef, \
+            ProcessPoolExecutor(max_workers=args.workers, initializer=_worker_init) as pool, \
+            ThreadPoolExecutor(max_workers=TEXT_WRITE_THREADS) as text_pool:
+        text_writes: List[Future] = []
+        alias_args = [tuple(copies.get(p, ())) for p in unique_paths]
+        results = pool.map(worker, map(str, unique_paths), alias_args, chunksize=8)
+        for pdf_path, res in zip(unique_paths, results):
+            if not res.ok:
+                pdfs_failed += 1 + len(copies.get(pdf_path, ()))
+                ef.write(res.line)
+                continue
+
+            for out in (res, *res.aliases):
+                rf.write(out.record if out.record is not None else out.line)
                 pdfs_processed += 1
 
                 if texts_dir is not None:
-                    (texts_dir / f"{record_id}.txt").write_text(text, encoding="utf-8", errors="ignore")
+                    text_writes.append(text_pool.submit(
+                        (texts_dir / f"{out.record_id}.txt").write_text, out.text, encoding="utf-8", errors="ignore",
+                    ))
+
+            if res.cache_key is not None:
+                cache.execute(
+                    "INSERT OR REPLACE INTO texts VALUES (?, ?, ?, ?, ?, ?)",
+                    (str(pdf_path), *res.cache_key, TEXT_EXTRACTOR, res.num_pages, res.text),
+                )
+                cache_pending += 1
+                if cache_pending >= TEXT_CACHE_COMMIT_EVERY:
+                    cache.commit()
+                    cache_pending = 0
+
+        # Surface any failed text write instead of losing it in a future
+        for fut in text_writes:
+            fut.result()
 
-            except Exception as e:
-                pdfs_failed += 1
-                ef.write(json.dumps({
-                    "source_file": str(pdf_path),
-                    "error": repr(e),
-                    "at": now_iso(),
-                }, ensure_ascii=False) + "\n")
+    cache.commit()
+    cache.close()
 
     print(f"Done.")
     print(f"PDFs found: {sources_scanned}")
+    print(f"Files skipped (not PDFs): {len(skipped_paths)}")
+    print(f"Duplicates (extracted once): {len(alias_of)}")
     print(f"PDFs processed: {pdfs_processed}")
     print(f"PDFs failed: {pdfs_failed}")
     print(f"Wrote: {records_path}")
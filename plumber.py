@@ -2,10 +2,21 @@ import zipfile
 import io
 import re
 import json
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
 import pdfplumber
 
+try:
+    import pypdfium2 as pdfium  # Used for extraction when installed; pdfplumber is the fallback
+except ImportError:
+    pdfium = None
+
+try:
+    import orjson  # Faster encoding of the output lines
+except ImportError:
+    orjson = None
+
 # ---------- CONFIG ----------
 import sys
 import os
@@ -24,7 +35,9 @@ else:
     print(f"Error: Could not find '{DEFAULT_ZIP}' or '{FALLBACK_ZIP}'.")
     print("Usage: python plumber.py <path_to_zip>")
     sys.exit(1)
-OUTPUT_FILE = "extracted_ticket_data.json"
+OUTPUT_FILE = "extracted_ticket_data.jsonl"
+WRITE_BUFFER_SIZE = 1 << 20  # 1 MiB
+MIN_PDF_SIZE = 67  # Zip members smaller than this are skipped as not PDFs
 
 STATUS_KEYWORDS = [
     "open", "opened", "resolved", "closed", "reopened",
@@ -33,16 +46,80 @@ STATUS_KEYWORDS = [
 
 # ---------- REGEX ----------
 DATE_REGEX = r"\b\d{4}-\d{2}-\d{2}\b|\b\d{2}/\d{2}/\d{4}\b"
-TIME_REGEX = r"\b\d{2}:\d{2}(:\d{2})?\b"
+TIME_REGEX = r"\b\d{2}:\d{2}(?::\d{2})?\b"
 EMAIL_REGEX = r"[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+"
 TICKET_ID_REGEX = r"(ticket\s*#?\s*\d+|\bID[:\s]*\d+)"
 
+# Compiled once; each category is scanned on its own so overlapping matches
+# ("ID: 2024-01-15" is both a ticket id and a date) are reported in both
+FIELD_PATTERNS = {
+    "dates": re.compile(DATE_REGEX, re.IGNORECASE),
+    "times": re.compile(TIME_REGEX, re.IGNORECASE),
+    "email_addresses": re.compile(EMAIL_REGEX, re.IGNORECASE),
+    "ticket_ids": re.compile(TICKET_ID_REGEX, re.IGNORECASE),
+}
+
 # ---------- HELPERS ----------
-def extract_text_and_metadata(pdf_bytes):
+def dumps_line(record):
+    """One line of OUTPUT_FILE, as bytes for the binary writer."""
+    if orjson is not None:
+        return orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def looks_like_pdf(z, name):
+    """Cheap header check (only the first block is inflated) so non-PDF members never reach the parser."""
+    if z.getinfo(name).file_size < MIN_PDF_SIZE:
+        return False
+    with z.open(name) as fh:
+        # Some producers put bytes before the header, so search the whole first KiB
+        return b"%PDF-" in fh.read(1024)
+
+
+def open_member(z, name):
+    """
+    In-memory file object for a PDF inside the zip. pdfminer and PDFium both seek
+    backwards constantly, and ZipExtFile handles every backward seek by re-reading the
+    member from its start (re-inflating it too when deflated), so it is read once here.
+    """
+    return io.BytesIO(z.read(name))
+
+
+def extract_text_and_metadata(pdf_file):
+    if pdfium is not None:
+        try:
+            return extract_with_pdfium(pdf_file)
+        except pdfium.PdfiumError:
+            pdf_file.seek(0)  # Let pdfplumber try PDFs PDFium won't load
+    return extract_with_pdfplumber(pdf_file)
+
+
+def extract_with_pdfium(pdf_file):
+    text = ""
+
+    pdf = pdfium.PdfDocument(pdf_file)
+    try:
+        metadata = pdf.get_metadata_dict(skip_empty=True)
+        num_pages = len(pdf)
+        for i in range(num_pages):
+            page = pdf[i]
+            textpage = page.get_textpage()
+            page_text = textpage.get_text_range().replace("\r\n", "\n")
+            textpage.close()
+            page.close()
+            if page_text:
+                text += page_text + "\n"
+    finally:
+        pdf.close()
+
+    return text.strip(), metadata, num_pages
+
+
+def extract_with_pdfplumber(pdf_file):
     text = ""
     metadata = {}
 
-    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+    with pdfplumber.open(pdf_file) as pdf:
         metadata = pdf.metadata or {}
         for page in pdf.pages:
             page_text = page.extract_text()
@@ -52,57 +129,83 @@ def extract_text_and_metadata(pdf_bytes):
         return text.strip(), metadata, len(pdf.pages)
 
 
-def find_matches(regex, text):
-    return sorted(set(re.findall(regex, text, re.IGNORECASE)))
+def find_fields(text):
+    """Unique, sorted matches per FIELD_PATTERNS category."""
+    return {
+        name: sorted(set(m.group() for m in pattern.finditer(text)))
+        for name, pattern in FIELD_PATTERNS.items()
+    }
+
+
+# Longest first: a keyword found inside the text brings along the keywords it
+# contains ("reopened" -> "opened", "open"), so those need no scan of their own
+_STATUS_SCAN_ORDER = sorted(STATUS_KEYWORDS, key=len, reverse=True)
+_STATUS_IMPLIED = {
+    kw: [other for other in STATUS_KEYWORDS if other != kw and other in kw]
+    for kw in STATUS_KEYWORDS
+}
 
 
 def extract_status_keywords(text):
     found = set()
     lower = text.lower()
-    for kw in STATUS_KEYWORDS:
-        if kw in lower:
+    for kw in _STATUS_SCAN_ORDER:
+        if kw not in found and kw in lower:
             found.add(kw)
+            found.update(_STATUS_IMPLIED[kw])
     return sorted(found)
 
 
 # ---------- MAIN ----------
-def process_zip(zip_path):
-    results = []
-
+def process_member(zip_path, name):
+    """Builds the record for one PDF in the zip (runs in a worker process)."""
+    with zipfile.ZipFile(zip_path, "r") as z, open_member(z, name) as pdf_file:
+        text, metadata, num_pages = extract_text_and_metadata(pdf_file)
+
+    fields = find_fields(text)
+    return {
+        "pdf_filename": name,
+        "num_pages": num_pages,
+        "pdf_metadata": metadata,
+        "timestamps": {
+            "dates": fields["dates"],
+            "times": fields["times"],
+        },
+        "email_addresses": fields["email_addresses"],
+        "ticket_ids": fields["ticket_ids"],
+        "status_keywords": extract_status_keywords(text),
+        "raw_text": text,
+        "extracted_at": datetime.utcnow().isoformat()
+    }
+
+
+def process_zip(zip_path, workers=None):
+    """Yields one record per PDF in the zip, in archive order, so callers can stream them out."""
     with zipfile.ZipFile(zip_path, "r") as z:
+        names = []
+        skipped = []
         for name in z.namelist():
-            if not name.lower().endswith(".pdf"):
-                continue
+            if name.lower().endswith(".pdf"):
+                (names if looks_like_pdf(z, name) else skipped).append(name)
 
-            print(f"Processing PDF: {name}")
-
-            pdf_bytes = z.read(name)
-            text, metadata, num_pages = extract_text_and_metadata(pdf_bytes)
-
-            record = {
-                "pdf_filename": name,
-                "num_pages": num_pages,
-                "pdf_metadata": metadata,
-                "timestamps": {
-                    "dates": find_matches(DATE_REGEX, text),
-                    "times": find_matches(TIME_REGEX, text),
-                },
-                "email_addresses": find_matches(EMAIL_REGEX, text),
-                "ticket_ids": find_matches(TICKET_ID_REGEX, text),
-                "status_keywords": extract_status_keywords(text),
-                "raw_text": text,
-                "extracted_at": datetime.utcnow().isoformat()
-            }
-
-            results.append(record)
+    if skipped:
+        print(f"Skipping {len(skipped)} member(s) that are not PDFs (empty or no %PDF- header):")
+        for name in skipped:
+            print(f"  {name}")
 
-    return results
+    # PDFs are parsed in parallel; pool.map hands results back in order
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for name, record in zip(names, pool.map(process_member, [zip_path] * len(names), names)):
+            print(f"Processing PDF: {name}")
+            yield record
 
 
 if __name__ == "__main__":
-    data = process_zip(ZIP_PATH)
-
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
-
-    print(f"\nExtraction complete → {OUTPUT_FILE}")
+    # One JSON object per line, written as each PDF finishes (memory stays flat)
+    count = 0
+    with open(OUTPUT_FILE, "wb", buffering=WRITE_BUFFER_SIZE) as f:
+        for record in process_zip(ZIP_PATH):
+            f.write(dumps_line(record))
+            count += 1
+
+    print(f"\nExtraction complete → {OUTPUT_FILE} ({count} records)")